@@ -90,22 +90,24 @@ class ZermeloPrimalDualOCP:
     def ode(self, time, xp, z):
         x0, x1, x2, p0, p1, p2 = xp
         u0, u1, lg, lu0p, lu0m, lu1p, lu1m = z
+        sin_u0, cos_u0 = np.sin(u0), np.cos(u0)
         dxpdt = np.zeros_like(xp)
-        dxpdt[0] = x2 * (u1 * np.cos(u0) + self.h(x1))
-        dxpdt[1] = x2 * u1 * np.sin(u0)
+        dxpdt[0] = x2 * (u1 * cos_u0 + self.h(x1))
+        dxpdt[1] = x2 * u1 * sin_u0
         dxpdt[2] = 0.
         dxpdt[3] = - lg * self.state_constraint(x0, x1, dx0=1)
         dxpdt[4] = - p0 * x2 * self.h(x1, d=1) - lg * self.state_constraint(x0, x1, dx1=1)
-        dxpdt[5] = - p0 * (u1 * np.cos(u0) + self.h(x1)) - p1 * u1 * np.sin(u0)
+        dxpdt[5] = - p0 * (u1 * cos_u0 + self.h(x1)) - p1 * u1 * sin_u0
         return dxpdt
 
     def odejac(self, time, xp, z):
         x0, x1, x2, p0, p1, p2 = xp
         u0, u1, lg, lu0p, lu0m, lu1p, lu1m = z
+        sin_u0, cos_u0 = np.sin(u0), np.cos(u0)
         jacx = np.zeros((xp.shape[0], xp.shape[0], len(time)))
         jacx[0, 1] = x2 * self.h(x1, d=1)
-        jacx[0, 2] = u1 * np.cos(u0) + self.h(x1)
-        jacx[1, 2] = u1 * np.sin(u0)
+        jacx[0, 2] = u1 * cos_u0 + self.h(x1)
+        jacx[1, 2] = u1 * sin_u0
         jacx[3, 0] = - lg * self.state_constraint(x0, x1, dx0=2)
         jacx[3, 1] = - lg * self.state_constraint(x0, x1, dx0=1, dx1=1)
         jacx[4, 0] = - lg * self.state_constraint(x0, x1, dx0=1, dx1=1)
@@ -113,27 +115,28 @@ class ZermeloPrimalDualOCP:
         jacx[4, 2] = - p0 * self.h(x1, d=1)
         jacx[4, 3] = - x2 * self.h(x1, d=1)
         jacx[5, 1] = - p0 * self.h(x1, d=1)
-        jacx[5, 3] = - (u1 * np.cos(u0) + self.h(x1))
-        jacx[5, 4] = - u1 * np.sin(u0)
+        jacx[5, 3] = - (u1 * cos_u0 + self.h(x1))
+        jacx[5, 4] = - u1 * sin_u0
 
         jacz = np.zeros((xp.shape[0], z.shape[0], len(time)))
-        jacz[0, 0] = - x2 * u1 * np.sin(u0)
-        jacz[0, 1] = x2 * np.cos(u0)
-        jacz[1, 0] = x2 * u1 * np.cos(u0)
-        jacz[1, 1] = x2 * np.sin(u0)
+        jacz[0, 0] = - x2 * u1 * sin_u0
+        jacz[0, 1] = x2 * cos_u0
+        jacz[1, 0] = x2 * u1 * cos_u0
+        jacz[1, 1] = x2 * sin_u0
         jacz[3, 2] = - self.state_constraint(x0, x1, dx0=1)
         jacz[4, 2] = - self.state_constraint(x0, x1, dx1=1)
-        jacz[5, 0] = p0 * u1 * np.sin(u0) - p1 * u1 * np.cos(u0)
-        jacz[5, 1] = - p0 * np.cos(u0) - p1 * np.sin(u0)
+        jacz[5, 0] = p0 * u1 * sin_u0 - p1 * u1 * cos_u0
+        jacz[5, 1] = - p0 * cos_u0 - p1 * sin_u0
         return jacx, jacz
 
     def algeq(self, time, xp, z):
         x0, x1, x2, p0, p1, p2 = xp
         u0, u1, lg, lu0p, lu0m, lu1p, lu1m = z
+        sin_u0, cos_u0 = np.sin(u0), np.cos(u0)
 
         dhdu = np.zeros_like(z)
-        dhdu[0] = - p0 * x2 * u1 * np.sin(u0) + p1 * x2 * u1 * np.cos(u0) + lu0p - lu0m
-        dhdu[1] = p0 * x2 * np.cos(u0) + p1 * x2 * np.sin(u0) + lu1p - lu1m
+        dhdu[0] = - p0 * x2 * u1 * sin_u0 + p1 * x2 * u1 * cos_u0 + lu0p - lu0m
+        dhdu[1] = p0 * x2 * cos_u0 + p1 * x2 * sin_u0 + lu1p - lu1m
         dhdu[2] = FB(lg, self.state_constraint(x0, x1), self.eps)
         dhdu[3] = FB(lu0p, u0 - self.u0max, self.eps)
         dhdu[4] = FB(lu0m, self.u0min - u0, self.eps)
@@ -144,23 +147,24 @@ class ZermeloPrimalDualOCP:
     def algjac(self, time, xp, z):
         x0, x1, x2, p0, p1, p2 = xp
         u0, u1, lg, lu0p, lu0m, lu1p, lu1m = z
+        sin_u0, cos_u0 = np.sin(u0), np.cos(u0)
 
         gx = np.zeros((z.shape[0], xp.shape[0], len(time)))
-        gx[0, 2] = - p0 * u1 * np.sin(u0) + p1 * u1 * np.cos(u0)
-        gx[0, 3] = - x2 * u1 * np.sin(u0)
-        gx[0, 4] = x2 * u1 * np.cos(u0)
-        gx[1, 2] = p0 * np.cos(u0) + p1 * np.sin(u0)
-        gx[1, 3] = x2 * np.cos(u0)
-        gx[1, 4] = x2 * np.sin(u0)
+        gx[0, 2] = - p0 * u1 * sin_u0 + p1 * u1 * cos_u0
+        gx[0, 3] = - x2 * u1 * sin_u0
+        gx[0, 4] = x2 * u1 * cos_u0
+        gx[1, 2] = p0 * cos_u0 + p1 * sin_u0
+        gx[1, 3] = x2 * cos_u0
+        gx[1, 4] = x2 * sin_u0
         gx[2, 0] = FB(lg, self.state_constraint(x0, x1), self.eps, dy=1) * self.state_constraint(x0, x1, dx0=1)
         gx[2, 1] = FB(lg, self.state_constraint(x0, x1), self.eps, dy=1) * self.state_constraint(x0, x1, dx1=1)
 
         gz = np.zeros((z.shape[0], z.shape[0], len(time)))
-        gz[0, 0] = - p0 * x2 * u1 * np.cos(u0) - p1 * x2 * u1 * np.sin(u0)
-        gz[0, 1] = - p0 * x2 * np.sin(u0) + p1 * x2 * np.cos(u0)
+        gz[0, 0] = - p0 * x2 * u1 * cos_u0 - p1 * x2 * u1 * sin_u0
+        gz[0, 1] = - p0 * x2 * sin_u0 + p1 * x2 * cos_u0
         gz[0, 3] = 1.
         gz[0, 4] = - 1.
-        gz[1, 0] = - p0 * x2 * np.sin(u0) + p1 * x2 * np.cos(u0)
+        gz[1, 0] = - p0 * x2 * sin_u0 + p1 * x2 * cos_u0
         gz[1, 5] = 1.
         gz[1, 6] = - 1.
         gz[2, 2] = FB(lg, self.state_constraint(x0, x1), self.eps, dx=1)
@@ -18,8 +18,231 @@ http://dx.doi.org/10.13140/RG.2.2.20384.76808
 
 Please cite these papers if you are using these methods.
 """
+import math
 import numpy as np
-from utils_functions import log_pen
+import numba
+from numba import carray, cfunc, njit, prange, types
+from utils_functions import log_pen_both
+
+# (row, col) of the non-zero entries of the Jacobians, indexed by slot
+_JACX_ROWS = np.array([0, 0, 1, 3, 3, 4, 4, 4, 4, 5, 5, 5])
+_JACX_COLS = np.array([1, 2, 2, 0, 1, 0, 1, 2, 3, 1, 3, 4])
+_JACZ_ROWS = np.array([0, 0, 1, 1])
+_JACZ_COLS = np.array([0, 1, 0, 1])
+_GX_ROWS = np.array([0, 0, 0, 1, 1, 1])
+_GX_COLS = np.array([2, 3, 4, 2, 3, 4])
+_GZ_ROWS = np.array([0, 0, 1, 1])
+_GZ_COLS = np.array([0, 1, 0, 1])
+
+# below this number of time steps the kernels run serially, thread spawning costing more than the loop itself
+_PARALLEL_MIN_SIZE = 256
+
+# fastmath flags that keep inf and nan: the log-barriers are infinite on their bounds, e.g. for a control equal to
+# u1max, which error_model="numpy" returns instead of raising ZeroDivisionError and which the Armijo search rejects
+_FASTMATH = {"contract", "arcp", "reassoc"}
+
+_log_pen_both = njit(inline="always", error_model="numpy")(log_pen_both)
+
+
+def _select(kernels, n):
+    # kernels is a (serial, parallel) pair of compiled loops over the time steps
+    return kernels[1] if n >= _PARALLEL_MIN_SIZE else kernels[0]
+
+
+@njit(inline="always", error_model="numpy")
+def _h_all(x1):
+    # h(x1) = 3 + .2 * x1 * (1 - x1) and its first two derivatives
+    t = .2 * x1
+    return 3. + t * (1. - x1), .2 - 2. * t, -4.
+
+
+@njit(inline="always", error_model="numpy")
+def _state_constraint_bundle(x0, x1, cx, cy, a1, a2, r):
+    # state constraint and its gradient, as returned by ZermeloPrimalOCP.state_constraint
+    val = - (x0 - cx) ** 2 / a1 ** 2 - (x1 - cy) ** 2 / a2 ** 2 + r ** 2
+    dx0 = - 2. * (x0 - cx / 2.) / a1 ** 2
+    dx1 = - 2. * (x1 - cy / 2.5) / a2 ** 2
+    return val, dx0, dx1
+
+
+@njit(inline="always", error_model="numpy")
+def _ode_rhs(x0, x1, x2, p0, p1, u0, u1, eps, cx, cy, a1, a2, r):
+    c = math.cos(u0)
+    s = math.sin(u0)
+    h, dh, _ = _h_all(x1)
+    sc, dsc_dx0, dsc_dx1 = _state_constraint_bundle(x0, x1, cx, cy, a1, a2, r)
+    lg = eps * _log_pen_both(sc)[0]
+    return (
+        x2 * (u1 * c + h),
+        x2 * u1 * s,
+        0.,
+        - lg * dsc_dx0,
+        - p0 * x2 * dh - lg * dsc_dx1,
+        - p0 * (u1 * c + h) - p1 * u1 * s
+    )
+
+
+@njit(inline="always", error_model="numpy")
+def _ode_point(i, xp, z, eps, cx, cy, a1, a2, r, out):
+    out[0, i], out[1, i], out[2, i], out[3, i], out[4, i], out[5, i] = _ode_rhs(
+        xp[0, i], xp[1, i], xp[2, i], xp[3, i], xp[4, i], z[0, i], z[1, i], eps, cx, cy, a1, a2, r
+    )
+
+
+@njit(fastmath=_FASTMATH, error_model="numpy", cache=True)
+def _ode_kernel_serial(xp, z, eps, cx, cy, a1, a2, r, out):
+    for i in range(xp.shape[1]):
+        _ode_point(i, xp, z, eps, cx, cy, a1, a2, r, out)
+
+
+@njit(fastmath=_FASTMATH, error_model="numpy", cache=True, parallel=True)
+def _ode_kernel_parallel(xp, z, eps, cx, cy, a1, a2, r, out):
+    for i in prange(xp.shape[1]):
+        _ode_point(i, xp, z, eps, cx, cy, a1, a2, r, out)
+
+
+_ode_kernel = (_ode_kernel_serial, _ode_kernel_parallel)
+
+
+# signature of the right-hand side expected by LSODA wrappers such as numbalsoda: rhs(t, y, dy, data)
+_lsoda_sig = types.void(types.double, types.CPointer(types.double), types.CPointer(types.double),
+                        types.CPointer(types.double))
+
+
+def _ode_cfunc(t, y_, dy_, data_):
+    y = carray(y_, (6,))
+    dy = carray(dy_, (6,))
+    data = carray(data_, (8,))
+    dy[0], dy[1], dy[2], dy[3], dy[4], dy[5] = _ode_rhs(
+        y[0], y[1], y[2], y[3], y[4], data[0], data[1], data[2], data[3], data[4], data[5], data[6], data[7]
+    )
+
+
+# compiled on the first call of get_ode_cfunc rather than at import, as no solver of the repo uses it
+_compiled_ode_cfunc = None
+
+
+def get_ode_cfunc():
+    """
+    Returns the C callback of the ODEs' right-hand side for a frozen control, data being
+    ZermeloPrimalOCP.ode_cfunc_data(z). Its address, get_ode_cfunc().address, can be given to a compiled integrator,
+    e.g. numbalsoda.lsoda.
+    """
+    global _compiled_ode_cfunc
+    if _compiled_ode_cfunc is None:
+        _compiled_ode_cfunc = cfunc(_lsoda_sig, fastmath=_FASTMATH, error_model="numpy", cache=True)(_ode_cfunc)
+    return _compiled_ode_cfunc
+
+
+@njit(inline="always", error_model="numpy")
+def _algeq_point(i, xp, z, eps, u0min, u0max, u1min, u1max, out):
+    x2, p0, p1 = xp[2, i], xp[3, i], xp[4, i]
+    u0, u1 = z[0, i], z[1, i]
+    c = math.cos(u0)
+    s = math.sin(u0)
+    lu0p = _log_pen_both(u0 - u0max)[0]
+    lu0m = _log_pen_both(u0min - u0)[0]
+    lu1p = _log_pen_both(u1 - u1max)[0]
+    lu1m = _log_pen_both(u1min - u1)[0]
+    out[0, i] = - p0 * x2 * u1 * s + p1 * x2 * u1 * c + eps * (lu0p - lu0m)
+    out[1, i] = p0 * x2 * c + p1 * x2 * s + eps * (lu1p - lu1m)
+
+
+@njit(fastmath=_FASTMATH, error_model="numpy", cache=True)
+def _algeq_kernel_serial(xp, z, eps, u0min, u0max, u1min, u1max, out):
+    for i in range(xp.shape[1]):
+        _algeq_point(i, xp, z, eps, u0min, u0max, u1min, u1max, out)
+
+
+@njit(fastmath=_FASTMATH, error_model="numpy", cache=True, parallel=True)
+def _algeq_kernel_parallel(xp, z, eps, u0min, u0max, u1min, u1max, out):
+    for i in prange(xp.shape[1]):
+        _algeq_point(i, xp, z, eps, u0min, u0max, u1min, u1max, out)
+
+
+_algeq_kernel = (_algeq_kernel_serial, _algeq_kernel_parallel)
+
+
+@njit(inline="always", error_model="numpy")
+def _ode_and_jac_point(i, xp, z, eps, cx, cy, a1, a2, r, scxx, scyy, jx_vals, jz_vals):
+    x0, x1, x2, p0, p1 = xp[0, i], xp[1, i], xp[2, i], xp[3, i], xp[4, i]
+    u0, u1 = z[0, i], z[1, i]
+    c = math.cos(u0)
+    s = math.sin(u0)
+    h, dh, ddh = _h_all(x1)
+    sc, dsc_dx0, dsc_dx1 = _state_constraint_bundle(x0, x1, cx, cy, a1, a2, r)
+    lg, dlg = _log_pen_both(sc)
+    lg *= eps
+    dlg *= eps
+    fh = u1 * c + h
+    jx_vals[0, i] = x2 * dh
+    jx_vals[1, i] = fh
+    jx_vals[2, i] = u1 * s
+    jx_vals[3, i] = - (dlg * dsc_dx0 ** 2 + lg * scxx)
+    jx_vals[4, i] = - dlg * dsc_dx1 * dsc_dx0
+    jx_vals[5, i] = jx_vals[4, i]
+    jx_vals[6, i] = - p0 * x2 * ddh - (dlg * dsc_dx1 ** 2 + lg * scyy)
+    jx_vals[7, i] = - p0 * dh
+    jx_vals[8, i] = - x2 * dh
+    jx_vals[9, i] = - p0 * dh
+    jx_vals[10, i] = - fh
+    jx_vals[11, i] = - u1 * s
+    jz_vals[0, i] = - x2 * u1 * s
+    jz_vals[1, i] = x2 * c
+    jz_vals[2, i] = x2 * u1 * c
+    jz_vals[3, i] = x2 * s
+
+
+@njit(fastmath=_FASTMATH, error_model="numpy", cache=True)
+def _ode_and_jac_serial(xp, z, eps, cx, cy, a1, a2, r, scxx, scyy, jx_vals, jz_vals):
+    for i in range(xp.shape[1]):
+        _ode_and_jac_point(i, xp, z, eps, cx, cy, a1, a2, r, scxx, scyy, jx_vals, jz_vals)
+
+
+@njit(fastmath=_FASTMATH, error_model="numpy", cache=True, parallel=True)
+def _ode_and_jac_parallel(xp, z, eps, cx, cy, a1, a2, r, scxx, scyy, jx_vals, jz_vals):
+    for i in prange(xp.shape[1]):
+        _ode_and_jac_point(i, xp, z, eps, cx, cy, a1, a2, r, scxx, scyy, jx_vals, jz_vals)
+
+
+_ode_and_jac = (_ode_and_jac_serial, _ode_and_jac_parallel)
+
+
+@njit(inline="always", error_model="numpy")
+def _algeq_and_jac_point(i, xp, z, eps, u0min, u0max, u1min, u1max, gx_vals, gz_vals):
+    x2, p0, p1 = xp[2, i], xp[3, i], xp[4, i]
+    u0, u1 = z[0, i], z[1, i]
+    c = math.cos(u0)
+    s = math.sin(u0)
+    dlu0p = _log_pen_both(u0 - u0max)[1]
+    dlu0m = _log_pen_both(u0min - u0)[1]
+    dlu1p = _log_pen_both(u1 - u1max)[1]
+    dlu1m = _log_pen_both(u1min - u1)[1]
+    gx_vals[0, i] = - p0 * u1 * s + p1 * u1 * c
+    gx_vals[1, i] = - x2 * u1 * s
+    gx_vals[2, i] = x2 * u1 * c
+    gx_vals[3, i] = p0 * c + p1 * s
+    gx_vals[4, i] = x2 * c
+    gx_vals[5, i] = x2 * s
+    gz_vals[0, i] = - p0 * x2 * u1 * c - p1 * x2 * u1 * s + eps * (dlu0p + dlu0m)
+    gz_vals[1, i] = - p0 * x2 * s + p1 * x2 * c
+    gz_vals[2, i] = gz_vals[1, i]
+    gz_vals[3, i] = eps * (dlu1p + dlu1m)
+
+
+@njit(fastmath=_FASTMATH, error_model="numpy", cache=True)
+def _algeq_and_jac_serial(xp, z, eps, u0min, u0max, u1min, u1max, gx_vals, gz_vals):
+    for i in range(xp.shape[1]):
+        _algeq_and_jac_point(i, xp, z, eps, u0min, u0max, u1min, u1max, gx_vals, gz_vals)
+
+
+@njit(fastmath=_FASTMATH, error_model="numpy", cache=True, parallel=True)
+def _algeq_and_jac_parallel(xp, z, eps, u0min, u0max, u1min, u1max, gx_vals, gz_vals):
+    for i in prange(xp.shape[1]):
+        _algeq_and_jac_point(i, xp, z, eps, u0min, u0max, u1min, u1max, gx_vals, gz_vals)
+
+
+_algeq_and_jac = (_algeq_and_jac_serial, _algeq_and_jac_parallel)
 
 
 class ZermeloPrimalOCP:
@@ -48,9 +271,64 @@ class ZermeloPrimalOCP:
         self.u0min = 0.
         self.eps = 1.
 
+        # second order derivatives of the state constraint, which are constant
+        self._scxx = - 2. / self.a1 ** 2
+        self._scyy = - 2. / self.a2 ** 2
+
+        # boundary conditions residual buffer and constant Jacobians, returned by twobc and bcjac
+        self._bc = np.empty((6,))
+        self._gx0 = np.zeros((6, 6))
+        self._gx0[:2, :2] = np.eye(2)
+        self._gx0[4, -1] = 1.
+        self._gxT = np.zeros((6, 6))
+        self._gxT[2:4, :2] = np.eye(2)
+        self._gxT[5, -1] = 1.
+        self._gz0 = np.zeros((6, 2))
+        self._gzT = np.zeros((6, 2))
+
+        # work arrays of odejac and algjac, keyed by the number of time steps
+        self._buffers = dict()
+
     def set_eps(self, eps):
         self.eps = eps
 
+    def set_num_threads(self, n_threads):
+        """
+        Sets the number of threads used by the kernels on grids of at least _PARALLEL_MIN_SIZE time steps.
+        """
+        numba.set_num_threads(n_threads)
+
+    def _get_buffers(self, n):
+        """
+        Returns the work arrays used by odejac and algjac for a grid of n time steps. The dense Jacobians are
+        zero-initialized once: only their non-zero slots are overwritten afterwards, so they must not be mutated by
+        the caller. The residuals returned by ode and algeq are not cached as the solver keeps several of them alive.
+        The arrays of the two most recently used sizes are kept.
+        """
+        buffers = self._buffers.pop(n, None)
+        if buffers is None:
+            # BVPDAE alternates between the grid and its midpoints, older sizes are not reused after mesh refinement
+            if len(self._buffers) >= 2:
+                self._buffers.pop(next(iter(self._buffers)))
+            k = np.arange(n)
+            buffers = dict(
+                jacx_rows=(_JACX_ROWS[:, None] + 6 * k).ravel(),
+                jacx_cols=(_JACX_COLS[:, None] + 6 * k).ravel(),
+                jacz_rows=(_JACZ_ROWS[:, None] + 6 * k).ravel(),
+                jacz_cols=(_JACZ_COLS[:, None] + 2 * k).ravel(),
+                jx_vals=np.empty((len(_JACX_ROWS), n)),
+                jz_vals=np.empty((len(_JACZ_ROWS), n)),
+                jacx=np.zeros((6, 6, n)),
+                jacz=np.zeros((6, 2, n)),
+                gx_vals=np.empty((len(_GX_ROWS), n)),
+                gz_vals=np.empty((len(_GZ_ROWS), n)),
+                gx=np.zeros((2, 6, n)),
+                gz=np.zeros((2, 2, n)),
+            )
+        # reinserted last, so that the first key is the least recently used size
+        self._buffers[n] = buffers
+        return buffers
+
     def initialize(self):
         n = 101
         time = np.linspace(0., 1., n)
@@ -82,108 +360,95 @@ class ZermeloPrimalOCP:
         if dx0 == 0 and dx1 == 1:
             return - 2. * (x1 - self.center[1] / 2.5) / self.a2 ** 2
         if dx0 == 2 and dx1 == 0:
-            return - 2. / self.a1 ** 2
+            return self._scxx
         if dx0 == 0 and dx1 == 2:
-            return - 2. / self.a2 ** 2
+            return self._scyy
         return np.zeros_like(x1)
 
     def ode(self, time, xp, z):
-        x0, x1, x2, p0, p1, p2 = xp
-        u0, u1 = z
-        lg = self.eps * log_pen(self.state_constraint(x0, x1), d=1)
-        dxpdt = np.zeros_like(xp)
-        dxpdt[0] = x2 * (u1 * np.cos(u0) + self.h(x1))
-        dxpdt[1] = x2 * u1 * np.sin(u0)
-        dxpdt[2] = 0.
-        dxpdt[3] = - lg * self.state_constraint(x0, x1, dx0=1)
-        dxpdt[4] = - p0 * x2 * self.h(x1, d=1) - lg * self.state_constraint(x0, x1, dx1=1)
-        dxpdt[5] = - p0 * (u1 * np.cos(u0) + self.h(x1)) - p1 * u1 * np.sin(u0)
+        xp, z = np.ascontiguousarray(xp, dtype=np.float64), np.ascontiguousarray(z, dtype=np.float64)
+        dxpdt = np.empty_like(xp)
+        _select(_ode_kernel, xp.shape[1])(
+            xp, z, self.eps, self.center[0], self.center[1], self.a1, self.a2, self.r, dxpdt
+        )
         return dxpdt
 
+    def _eval_ode_and_jac(self, time, xp, z):
+        xp, z = np.ascontiguousarray(xp, dtype=np.float64), np.ascontiguousarray(z, dtype=np.float64)
+        buffers = self._get_buffers(len(time))
+        _select(_ode_and_jac, xp.shape[1])(
+            xp, z, self.eps, self.center[0], self.center[1], self.a1, self.a2, self.r, self._scxx, self._scyy,
+            buffers["jx_vals"], buffers["jz_vals"]
+        )
+        return buffers
+
+    def ode_cfunc_data(self, z):
+        """
+        Packs the parameters of get_ode_cfunc() for the control z = (u0, u1) held constant over the integration.
+        """
+        return np.array([z[0], z[1], self.eps, self.center[0], self.center[1], self.a1, self.a2, self.r])
+
     def odejac(self, time, xp, z):
-        x0, x1, x2, p0, p1, p2 = xp
-        u0, u1 = z
-        lg = self.eps * log_pen(self.state_constraint(x0, x1), d=1)
-        dlg = self.eps * log_pen(self.state_constraint(x0, x1), d=2)
-        dstate_const_dx0 = self.state_constraint(x0, x1, dx0=1)
-        dstate_const_dx1 = self.state_constraint(x0, x1, dx1=1)
-        jacx = np.zeros((xp.shape[0], xp.shape[0], len(time)))
-        jacx[0, 1] = x2 * self.h(x1, d=1)
-        jacx[0, 2] = u1 * np.cos(u0) + self.h(x1)
-        jacx[1, 2] = u1 * np.sin(u0)
-        jacx[3, 0] = - (dlg * dstate_const_dx0 ** 2 + lg * self.state_constraint(x0, x1, dx0=2))
-        jacx[3, 1] = - (dlg * dstate_const_dx1 * dstate_const_dx0 + lg * self.state_constraint(x0, x1, dx0=1, dx1=1))
-        jacx[4, 0] = jacx[3, 1]
-        jacx[4, 1] = - p0 * x2 * self.h(x1, d=2) - (dlg * dstate_const_dx1 ** 2 + lg * self.state_constraint(x0, x1, dx1=2))
-        jacx[4, 2] = - p0 * self.h(x1, d=1)
-        jacx[4, 3] = - x2 * self.h(x1, d=1)
-        jacx[5, 1] = - p0 * self.h(x1, d=1)
-        jacx[5, 3] = - (u1 * np.cos(u0) + self.h(x1))
-        jacx[5, 4] = - u1 * np.sin(u0)
-
-        jacz = np.zeros((xp.shape[0], z.shape[0], len(time)))
-        jacz[0, 0] = - x2 * u1 * np.sin(u0)
-        jacz[0, 1] = x2 * np.cos(u0)
-        jacz[1, 0] = x2 * u1 * np.cos(u0)
-        jacz[1, 1] = x2 * np.sin(u0)
+        """
+        Returns the Jacobians of ode with respect to xp and z in arrays owned by the ocp: they are overwritten by the
+        next call to odejac on a grid of the same size and must not be mutated
+        """
+        buffers = self._eval_ode_and_jac(time, xp, z)
+        jacx, jacz = buffers["jacx"], buffers["jacz"]
+        jacx[_JACX_ROWS, _JACX_COLS] = buffers["jx_vals"]
+        jacz[_JACZ_ROWS, _JACZ_COLS] = buffers["jz_vals"]
         return jacx, jacz
 
+    def odejac_sparse(self, time, xp, z):
+        """
+        Sparse counterpart of odejac. The Jacobians of ode(time, xp, z).ravel(order="F") with respect to
+        xp.ravel(order="F") and z.ravel(order="F") are block diagonal and are returned as (rows, cols, vals) triplets,
+        e.g. for scipy.sparse.coo_matrix((vals, (rows, cols))). rows and cols only depend on the number of time steps
+        and are cached. vals are views of the work arrays odejac fills too, so they are overwritten by the next call to
+        odejac or odejac_sparse on a grid of the same size. None of these arrays must be mutated.
+        """
+        buffers = self._eval_ode_and_jac(time, xp, z)
+        return (
+            (buffers["jacx_rows"], buffers["jacx_cols"], buffers["jx_vals"].ravel()),
+            (buffers["jacz_rows"], buffers["jacz_cols"], buffers["jz_vals"].ravel())
+        )
+
     def algeq(self, time, xp, z):
-        x0, x1, x2, p0, p1, p2 = xp
-        u0, u1 = z
-        lu0p = self.eps * log_pen(u0 - self.u0max, d=1)
-        lu0m = self.eps * log_pen(self.u0min - u0, d=1)
-        lu1p = self.eps * log_pen(u1 - self.u1max, d=1)
-        lu1m = self.eps * log_pen(self.u1min - u1, d=1)
-        dhdu = np.zeros_like(z)
-        dhdu[0] = - p0 * x2 * u1 * np.sin(u0) + p1 * x2 * u1 * np.cos(u0) + lu0p - lu0m
-        dhdu[1] = p0 * x2 * np.cos(u0) + p1 * x2 * np.sin(u0) + lu1p - lu1m
+        xp, z = np.ascontiguousarray(xp, dtype=np.float64), np.ascontiguousarray(z, dtype=np.float64)
+        dhdu = np.empty_like(z)
+        _select(_algeq_kernel, xp.shape[1])(
+            xp, z, self.eps, self.u0min, self.u0max, self.u1min, self.u1max, dhdu
+        )
         return dhdu
 
     def algjac(self, time, xp, z):
-        x0, x1, x2, p0, p1, p2 = xp
-        u0, u1 = z
-        dlu0p_du0 = self.eps * log_pen(u0 - self.u0max, d=2)
-        dlu0m_du0 = - self.eps * log_pen(self.u0min - u0, d=2)
-        dlu1p_du1 = self.eps * log_pen(u1 - self.u1max, d=2)
-        dlu1m_du1 = - self.eps * log_pen(self.u1min - u1, d=2)
-        gx = np.zeros((z.shape[0], xp.shape[0], len(time)))
-        gx[0, 2] = - p0 * u1 * np.sin(u0) + p1 * u1 * np.cos(u0)
-        gx[0, 3] = - x2 * u1 * np.sin(u0)
-        gx[0, 4] = x2 * u1 * np.cos(u0)
-        gx[1, 2] = p0 * np.cos(u0) + p1 * np.sin(u0)
-        gx[1, 3] = x2 * np.cos(u0)
-        gx[1, 4] = x2 * np.sin(u0)
-
-        gz = np.zeros((z.shape[0], z.shape[0], len(time)))
-        gz[0, 0] = - p0 * x2 * u1 * np.cos(u0) - p1 * x2 * u1 * np.sin(u0) + dlu0p_du0 - dlu0m_du0
-        gz[0, 1] = - p0 * x2 * np.sin(u0) + p1 * x2 * np.cos(u0)
-        gz[1, 0] = - p0 * x2 * np.sin(u0) + p1 * x2 * np.cos(u0)
-        gz[1, 1] = dlu1p_du1 - dlu1m_du1
+        """
+        Returns the Jacobians of algeq with respect to xp and z in arrays owned by the ocp: they are overwritten by
+        the next call to algjac on a grid of the same size and must not be mutated
+        """
+        xp, z = np.ascontiguousarray(xp, dtype=np.float64), np.ascontiguousarray(z, dtype=np.float64)
+        buffers = self._get_buffers(len(time))
+        gx_vals, gz_vals, gx, gz = buffers["gx_vals"], buffers["gz_vals"], buffers["gx"], buffers["gz"]
+        _select(_algeq_and_jac, xp.shape[1])(
+            xp, z, self.eps, self.u0min, self.u0max, self.u1min, self.u1max, gx_vals, gz_vals
+        )
+        gx[_GX_ROWS, _GX_COLS] = gx_vals
+        gz[_GZ_ROWS, _GZ_COLS] = gz_vals
         return gx, gz
 
     def twobc(self, xp0, xpT, z0, zT):
-        bc = np.zeros_like(xp0)
-        bc[:2] = xp0[:2] - self.x0
-        bc[2:4] = xpT[:2] - self.xfinal
+        """
+        Returns the residual of the boundary conditions in a buffer overwritten by the next call
+        """
+        bc = self._bc
+        np.subtract(xp0[:2], self.x0, out=bc[:2])
+        np.subtract(xpT[:2], self.xfinal, out=bc[2:4])
         bc[4] = xp0[-1]
         bc[5] = xpT[-1] - 1.
         return bc
 
     def bcjac(self, xp0, xpT, z0, zT):
-        gx0 = np.zeros((xp0.size, xp0.size))
-        gx0[:2, :2] = np.eye(2)
-        gx0[4, -1] = 1.
-
-        gxT = np.zeros((xpT.size, xpT.size))
-        gxT[2:4, :2] = np.eye(2)
-        gxT[5, -1] = 1.
-
-        gz0 = np.zeros((xp0.size, z0.size))
-        gzT = gz0.copy()
-
-        return gx0, gxT, gz0, gzT
-
-
-
-
+        """
+        Returns the constant Jacobians of the boundary conditions, shared between calls: they must not be mutated
+        """
+        return self._gx0, self._gxT, self._gz0, self._gzT
@@ -19,7 +19,12 @@ http://dx.doi.org/10.13140/RG.2.2.20384.76808
 Please cite these papers if you are using these methods.
 """
 import numpy as np
+import os
+import shutil
+import subprocess
 import sys
+import tempfile
+import weakref
 from nlse_funs import solve_newton, estimate_rms, create_new_xp_z_zmid, row_col_jac_indices
 import casadi as cs
 from inspect import ismethod
@@ -85,6 +90,10 @@ This is a Two Point Boundary Value Problem solver consisting in ODEs coupled wit
     - **max_probes:** Maximum number of damping operations for armijo step selection. Default is 6
     - **reg_hess:** Hessian regularization parameters. Default is (0., 1e-7)
     - **max_reg_hessian_probes:** Maximum probes for hessian regularization. Default is 10
+    - **codegen:** Boolean when True the functions of an ocp written in the Casadi framework are generated in C and compiled into a shared library (requires a C compiler, given by the CC environment variable or cc). Default is False
+    - **codegen_dir:** Directory where the generated code is compiled. Default is a new temporary directory, removed once the compiled functions are no longer used
+
+When the ocp does not provide its Jacobians, it is assumed to be written in the Casadi framework. Its functions are then built once and reused by the following calls to solve with the same ocp, the value of ocp.eps being read at each evaluation. Any other attribute of the ocp modified between two solves is ignored unless reset_cs_ocp is called.
     """
     def __init__(self, **kwargs):
         self.display = kwargs.get("display", 0)
@@ -127,6 +136,10 @@ This is a Two Point Boundary Value Problem solver consisting in ODEs coupled wit
             self.linear_solver = 0
         else:
             self.linear_solver = 1
+        self.codegen = kwargs.get("codegen", False)
+        self.codegen_dir = kwargs.get("codegen_dir", None)
+        # CasADi ocps are wrapped once and reused along the continuation on eps
+        self._cs_ocp = None
 
     def solve(self, bvp_sol, ocp):
         """
@@ -153,7 +166,7 @@ This is a Two Point Boundary Value Problem solver consisting in ODEs coupled wit
         time, xp, z, zmid = bvp_sol.time, bvp_sol.xp, bvp_sol.z, bvp_sol.zmid
 
         if not provided_jacobians:
-            ocp = _csOCP(ocp, xp, z)
+            ocp = self._get_cs_ocp(ocp, xp, z)
 
         ne, na = xp.shape[0], z.shape[0]
         rowis, colis, shape_jac, Inn, res_odeis, res_algis = row_col_jac_indices(time, ne, na)
@@ -218,47 +231,74 @@ This is a Two Point Boundary Value Problem solver consisting in ODEs coupled wit
             print("Solving complete")
         return BVPSol(time=time, xp=xp, z=z, zmid=zmid), infos
 
+    def reset_cs_ocp(self):
+        """
+        Discards the functions built for an ocp written in the Casadi framework, so that they are rebuilt at the next
+        call to solve. It must be called when attributes of the ocp other than eps are modified between two solves.
+        """
+        self._cs_ocp = None
+
+    def _get_cs_ocp(self, ocp, xp, z):
+        """
+        Returns the NumPy wrapper of an ocp written in the CasADi framework. The wrapper is built once and reused as
+        long as the same ocp is solved, the value of eps being read from the ocp at each evaluation.
+
+        :param ocp: ocp written in the Casadi framework
+        :param xp: NumPy array containing the ODEs' solution.
+        :param z: NumPy array containing the solution of the algebraic equations.
+        :return: _csOCP wrapping ocp
+        """
+        cs_ocp = self._cs_ocp
+        if cs_ocp is None or cs_ocp.ocp is not ocp or cs_ocp.dims != (xp.shape[0], z.shape[0]):
+            cs_ocp = _csOCP(ocp, xp, z)
+            if self.codegen:
+                cs_ocp.compile(self.codegen_dir)
+            self._cs_ocp = cs_ocp
+        return cs_ocp
+
 
-def build_running_fun_and_jacobian(fun, ode_sol_val, alg_sol_val):
+def build_running_fun_and_jacobian(fun, ode_sol_val, alg_sol_val, params=(), name='F'):
     # Initialize symbolic variables
     t = cs.MX.sym('t', 1)
     ode_sol = cs.MX.sym('ode_sol', ode_sol_val.shape[0])
     alg_sol = cs.MX.sym('alg_sol', alg_sol_val.shape[0])
+    inputs = [t, ode_sol, alg_sol, *params]
 
     # create CASADi function
     cfun = fun(t, ode_sol, alg_sol)
-    F = cs.Function('F', [t, ode_sol, alg_sol], [cfun])
+    F = cs.Function(name, inputs, [cfun])
 
     # Compute the Jacobian of f with respect to ode_sol
     jac_wrt_ode_sol = cs.jacobian(cfun, ode_sol)
     # Create a CASADi function for the Jacobian
-    jac_wrt_ode_sol_func = cs.Function('jac_wrt_ode_sol_func', [t, ode_sol, alg_sol], [jac_wrt_ode_sol])
+    jac_wrt_ode_sol_func = cs.Function(name + '_jac_wrt_ode_sol_func', inputs, [jac_wrt_ode_sol])
 
     # Compute the Jacobian of f with respect to alg_sol
     jac_wrt_alg_sol = cs.jacobian(cfun, alg_sol)
     # Create a CASADi function for the Jacobian
-    jac_wrt_alg_sol_func = cs.Function('jac_wrt_alg_sol_func', [t, ode_sol, alg_sol], [jac_wrt_alg_sol])
+    jac_wrt_alg_sol_func = cs.Function(name + '_jac_wrt_alg_sol_func', inputs, [jac_wrt_alg_sol])
 
     return F, jac_wrt_ode_sol_func, jac_wrt_alg_sol_func
 
 
-def build_bc_fun_and_jacobian(twobc, ode_sol_0_val, ode_sol_T_val, alg_sol_0_val, alg_sol_T_val):
+def build_bc_fun_and_jacobian(twobc, ode_sol_0_val, ode_sol_T_val, alg_sol_0_val, alg_sol_T_val, params=()):
     # Initialize symbolic variables
     ode_sol_0 = cs.MX.sym('ode_sol_0', ode_sol_0_val.size)
     ode_sol_T = cs.MX.sym('ode_sol_T', ode_sol_T_val.size)
     alg_sol_0 = cs.MX.sym('alg_sol_0', alg_sol_0_val.size)
     alg_sol_T = cs.MX.sym('alg_sol_T', alg_sol_T_val.size)
+    inputs = [ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T, *params]
 
     # create CASADi function
     ctwobc = twobc(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T)
-    twobc_func = cs.Function('twobc_func', [ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T], [ctwobc])
+    twobc_func = cs.Function('twobc_func', inputs, [ctwobc])
 
     # Compute the Jacobian of f with respect to ode_sol_0
     jacbc_wrt_ode_sol_0 = cs.jacobian(ctwobc, ode_sol_0)
 
     # Create a CASADi function for the Jacobian
     jacbc_wrt_ode_sol_0_func = cs.Function(
-        'jacbc_wrt_ode_sol_0_func', [ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T], [jacbc_wrt_ode_sol_0]
+        'jacbc_wrt_ode_sol_0_func', inputs, [jacbc_wrt_ode_sol_0]
     )
 
     # Compute the Jacobian of f with respect to ode_sol_T
@@ -266,7 +306,7 @@ def build_bc_fun_and_jacobian(twobc, ode_sol_0_val, ode_sol_T_val, alg_sol_0_val
 
     # Create a CASADi function for the Jacobian
     jacbc_wrt_ode_sol_T_func = cs.Function(
-        'jacbc_wrt_ode_sol_T_func', [ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T], [jacbc_wrt_ode_sol_T]
+        'jacbc_wrt_ode_sol_T_func', inputs, [jacbc_wrt_ode_sol_T]
     )
 
     # Compute the Jacobian of f with respect to alg_sol_0
@@ -274,7 +314,7 @@ def build_bc_fun_and_jacobian(twobc, ode_sol_0_val, ode_sol_T_val, alg_sol_0_val
 
     # Create a CASADi function for the Jacobian
     jacbc_wrt_alg_sol_0_func = cs.Function(
-        'jacbc_wrt_alg_sol_0_func', [ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T], [jacbc_wrt_alg_sol_0]
+        'jacbc_wrt_alg_sol_0_func', inputs, [jacbc_wrt_alg_sol_0]
     )
 
     # Compute the Jacobian of f with respect to alg_sol_T
@@ -282,7 +322,7 @@ def build_bc_fun_and_jacobian(twobc, ode_sol_0_val, ode_sol_T_val, alg_sol_0_val
 
     # Create a CASADi function for the Jacobian
     jacbc_wrt_alg_sol_T_func = cs.Function(
-        'jacbc_wrt_alg_sol_T_func', [ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T], [jacbc_wrt_alg_sol_T]
+        'jacbc_wrt_alg_sol_T_func', inputs, [jacbc_wrt_alg_sol_T]
     )
 
     return (
@@ -299,18 +339,76 @@ class _csOCP:
         :param alg_sol: NumPy array containing the solution of the algebraic equations.
     """
     def __init__(self, ocp, ode_sol, alg_sol):
+        self.ocp = ocp
+        self.dims = (ode_sol.shape[0], alg_sol.shape[0])
+
+        # eps is a symbolic parameter of the CasADi functions so that they do not depend on its current value
+        params = ()
+        eps = getattr(ocp, "eps", None)
+        if eps is not None:
+            params = (cs.MX.sym('eps', 1),)
+            ocp.eps = params[0]
+        try:
+            self._ode, self._jacode_wrt_ode_sol, self._jacode_wrt_alg_sol = build_running_fun_and_jacobian(
+                ocp.ode, ode_sol, alg_sol, params, name='ode'
+            )
 
-        self._ode, self._jacode_wrt_ode_sol, self._jacode_wrt_alg_sol = build_running_fun_and_jacobian(
-            ocp.ode, ode_sol, alg_sol
-        )
-
-        self._algeq, self._jacalg_wrt_ode_sol, self._jacalg_wrt_alg_sol = build_running_fun_and_jacobian(
-            ocp.algeq, ode_sol, alg_sol
-        )
+            self._algeq, self._jacalg_wrt_ode_sol, self._jacalg_wrt_alg_sol = build_running_fun_and_jacobian(
+                ocp.algeq, ode_sol, alg_sol, params, name='algeq'
+            )
 
-        self._twobc, self._jacbc_ode_sol_0, self._jacbc_ode_sol_T, self._jacbc_alg_sol_0, self._jacbc_alg_sol_T = (
-            build_bc_fun_and_jacobian(ocp.twobc, ode_sol[:, 0], ode_sol[:, -1], alg_sol[:, 0], alg_sol[:, -1])
-        )
+            self._twobc, self._jacbc_ode_sol_0, self._jacbc_ode_sol_T, self._jacbc_alg_sol_0, self._jacbc_alg_sol_T = (
+                build_bc_fun_and_jacobian(
+                    ocp.twobc, ode_sol[:, 0], ode_sol[:, -1], alg_sol[:, 0], alg_sol[:, -1], params
+                )
+            )
+        finally:
+            if eps is not None:
+                ocp.eps = eps
+        self._has_eps = eps is not None
+        # mapped functions, keyed by (name, number of time steps)
+        self._maps = dict()
+
+    def compile(self, directory=None):
+        """Generates the C code of all the CasADi functions, compiles it into a shared library and replaces the
+        functions by the compiled ones. As eps is an input of the functions, the library is valid for all its values.
+
+            :param directory: directory where the code is generated and compiled. Default is a new temporary directory,
+                removed when the wrapper is garbage collected
+        """
+        names = [
+            "_ode", "_jacode_wrt_ode_sol", "_jacode_wrt_alg_sol", "_algeq", "_jacalg_wrt_ode_sol", "_jacalg_wrt_alg_sol",
+            "_twobc", "_jacbc_ode_sol_0", "_jacbc_ode_sol_T", "_jacbc_alg_sol_0", "_jacbc_alg_sol_T"
+        ]
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="bvpdae_")
+            # the temporary directory lives as long as the compiled functions
+            weakref.finalize(self, shutil.rmtree, directory, ignore_errors=True)
+        code_generator = cs.CodeGenerator("bvpdae_ocp.c")
+        for name in names:
+            code_generator.add(getattr(self, name))
+        c_file = code_generator.generate(directory + os.sep)
+        lib_file = os.path.splitext(c_file)[0] + ".so"
+        subprocess.run([os.environ.get("CC", "cc"), "-O3", "-shared", "-fPIC", c_file, "-o", lib_file], check=True)
+        for name in names:
+            setattr(self, name, cs.external(getattr(self, name).name(), lib_file))
+        self._maps = dict()
+
+    def _params(self):
+        if self._has_eps:
+            return (self.ocp.eps,)
+        return ()
+
+    def _map(self, name, n):
+        fun = self._maps.pop((name, n), None)
+        if fun is None:
+            # the grid changes with mesh refinement, only the most recently used sizes are kept
+            if len(self._maps) >= 24:
+                self._maps.pop(next(iter(self._maps)))
+            fun = getattr(self, name).map(n)
+        # reinserted last, so that the first key is the least recently used one
+        self._maps[(name, n)] = fun
+        return fun
 
     def ode(self, time, ode_sol, alg_sol):
 
@@ -321,8 +419,8 @@ class _csOCP:
             :param alg_sol: Numpy array of algebraic solutions at discretization points
             :return: **rhs_ode**: Numpy array of time derivative of ode_sol at discretization points
         """
-        ode_vec = self._ode.map(len(time))
-        return np.array(ode_vec(time, ode_sol, alg_sol)).reshape(ode_sol.shape, order="F")
+        ode_vec = self._map("_ode", len(time))
+        return np.array(ode_vec(time, ode_sol, alg_sol, *self._params())).reshape(ode_sol.shape, order="F")
 
     def algeq(self, time, ode_sol, alg_sol):
         """This function returns the residual of the algbreaic equations
@@ -336,12 +434,12 @@ class _csOCP:
             :return:
                 **res_alg_eq**: 2d Numpy array of residual of algebraic equations
         """
-        algeq_vec = self._algeq.map(len(time))
-        return np.array(algeq_vec(time, ode_sol, alg_sol)).reshape(alg_sol.shape, order="F")
+        algeq_vec = self._map("_algeq", len(time))
+        return np.array(algeq_vec(time, ode_sol, alg_sol, *self._params())).reshape(alg_sol.shape, order="F")
 
     def twobc(self, ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T):
 
-        return np.array(self._twobc(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T)).flatten()
+        return np.array(self._twobc(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T, *self._params())).flatten()
 
     def odejac(self, time, ode_sol, alg_sol):
         """This function returns the Jacobians of the ODEs' right-hand side as three dimensional Numpy arrays
@@ -356,13 +454,13 @@ class _csOCP:
                 - **jac_ode_wrt_ode_sol**: 3D Numpy array of ODE's right hand side Jacobian with respect to ode_sol at discretization points
                 - **jac_ode_wrt_ode_sol**: 3D Numpy array of ODE's right hand side Jacobian with respect to alg_sol at discretization points
         """
-        jacode_wrt_ode_sol_vectorized = self._jacode_wrt_ode_sol.map(len(time))
-        jacode_wrt_alg_sol_vectorized = self._jacode_wrt_alg_sol.map(len(time))
+        jacode_wrt_ode_sol_vectorized = self._map("_jacode_wrt_ode_sol", len(time))
+        jacode_wrt_alg_sol_vectorized = self._map("_jacode_wrt_alg_sol", len(time))
         return (
-            np.array(jacode_wrt_ode_sol_vectorized(time, ode_sol, alg_sol)).reshape(
+            np.array(jacode_wrt_ode_sol_vectorized(time, ode_sol, alg_sol, *self._params())).reshape(
                 ode_sol.shape[0], ode_sol.shape[0], ode_sol.shape[1], order="F"
             ),
-            np.array(jacode_wrt_alg_sol_vectorized(time, ode_sol, alg_sol)).reshape(
+            np.array(jacode_wrt_alg_sol_vectorized(time, ode_sol, alg_sol, *self._params())).reshape(
                 ode_sol.shape[0], alg_sol.shape[0], ode_sol.shape[1], order="F"
             )
         )
@@ -377,13 +475,13 @@ class _csOCP:
                 - **jac_alg_wrt_ode_sol**: 3D Numpy array of algebraic equations Jacobian with respect to ode_sol at discretization points
                 - **jac_alg_wrt_alg_sol**: 3D Numpy array of algebraic equations Jacobian with respect to alg_sol at discretization points
         """
-        jacalg_wrt_ode_sol_vectorized = self._jacalg_wrt_ode_sol.map(len(time))
-        jacalg_wrt_alg_sol_vectorized = self._jacalg_wrt_alg_sol.map(len(time))
+        jacalg_wrt_ode_sol_vectorized = self._map("_jacalg_wrt_ode_sol", len(time))
+        jacalg_wrt_alg_sol_vectorized = self._map("_jacalg_wrt_alg_sol", len(time))
         return (
-            np.array(jacalg_wrt_ode_sol_vectorized(time, ode_sol, alg_sol)).reshape(
+            np.array(jacalg_wrt_ode_sol_vectorized(time, ode_sol, alg_sol, *self._params())).reshape(
                 alg_sol.shape[0], ode_sol.shape[0], ode_sol.shape[1], order="F"
             ),
-            np.array(jacalg_wrt_alg_sol_vectorized(time, ode_sol, alg_sol)).reshape(
+            np.array(jacalg_wrt_alg_sol_vectorized(time, ode_sol, alg_sol, *self._params())).reshape(
                 alg_sol.shape[0], alg_sol.shape[0], ode_sol.shape[1], order="F"
             )
         )
@@ -391,10 +489,10 @@ class _csOCP:
     def bcjac(self, ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T):
 
         return (
-            np.array(self._jacbc_ode_sol_0(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T)),
-            np.array(self._jacbc_ode_sol_T(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T)),
-            np.array(self._jacbc_alg_sol_0(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T)),
-            np.array(self._jacbc_alg_sol_T(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T))
+            np.array(self._jacbc_ode_sol_0(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T, *self._params())),
+            np.array(self._jacbc_ode_sol_T(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T, *self._params())),
+            np.array(self._jacbc_alg_sol_0(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T, *self._params())),
+            np.array(self._jacbc_alg_sol_T(ode_sol_0, ode_sol_T, alg_sol_0, alg_sol_T, *self._params()))
         )
 
 
@@ -23,7 +23,7 @@ from bvpdae_solver import BVPDAE, BVPSol
 from timeit import default_timer as dtime
 from utils_functions import plot_sequence
 import matplotlib.pyplot as plt
-import pickle
+import numpy as np
 import os                                 # for saving computations
 import json                               # for saving computations
 
@@ -40,7 +40,11 @@ def main_primal_dual():
     bvp_solver = BVPDAE(**options)
     convergence = False
     iter = 0
-    times, hs, vs, ms, us, p1s, p2s, p3s, mus, nups, nums, qs = [list() for _ in range(12)]
+    # number of iterations of the continuation, one extra slot absorbs the rounding of eps *= alpha
+    max_iter = int(np.ceil(np.log(tol / eps) / np.log(alpha))) + 2
+    # the mesh is refined along the iterations, so solutions are stored on a common grid
+    grid = np.linspace(time[0], time[-1], 1001)
+    traces = np.empty((max_iter, 12, len(grid)))
     bvp_sol = BVPSol(time=time, xp=xp, z=z)
     while not convergence:
         print("eps = ", eps)
@@ -55,24 +59,18 @@ def main_primal_dual():
         convergence = eps <= tol
         eps *= alpha
         ocp.set_eps(eps)
-        times.append(xp[3, 0] * time)
-        hs.append(xp[0, :])
-        vs.append(xp[1, :])
-        ms.append(xp[2, :])
-        qs.append(ocp.dyn_press(xp[0, :], xp[1, :]))
-        us.append(z[0, :])
-        p1s.append(xp[4, :])
-        p2s.append(xp[5, :])
-        p3s.append(xp[6, :])
-        mus.append(z[1, :])
-        nups.append(z[2, :])
-        nums.append(z[3, :])
+        traces[iter, 0] = xp[3, 0] * grid
+        for k, y in enumerate((xp[0], xp[1], xp[2], z[0], xp[4], xp[5], xp[6], z[1], z[2], z[3],
+                               ocp.dyn_press(xp[0], xp[1])), start=1):
+            traces[iter, k] = np.interp(grid, time, y)
         iter += 1
         print(" ")
+    times, hs, vs, ms, us, p1s, p2s, p3s, mus, nups, nums, qs = traces[:iter].transpose(1, 0, 2)
     optimal_solution = dict(time=time, xp=xp, z=z, eps=eps / alpha, alpha=alpha, exec_time=cumul_time, iter=iter)
-    dict_save = dict(initial_solution=initial_solution, optimal_solution=optimal_solution)
-    with open("Goddard/results_goddard_primal_dual.pickle", "wb") as fh:
-        pickle.dump(dict_save, fh)
+    np.savez_compressed(
+        "Goddard/results_goddard_primal_dual.npz",
+        **optimal_solution, **{"initial_" + key: value for key, value in initial_solution.items()}
+    )
     plot_sequence(times, mus, "$\mu(t)$",
                   "Sequence of optimal penalized state-constraint multiplier $\\bar{\lambda}_\epsilon^g$")
     plot_sequence(times, nups, "$\eta_1(t)$",
@@ -96,12 +94,10 @@ def main_primal_dual():
     print("Number of iterations = ", len(times))
     print("Number of final time steps = ", len(time))
 
-    # save json file
+    # save json file, read by the julia notebook
     data_solution = {'t':time.tolist(), 'xp':xp.tolist(), 'z':z.tolist()}
-    json_object = json.dumps(data_solution, ensure_ascii=False, indent=4)
     with open("Goddard/results_goddard_primal_dual.json", 'w', encoding='utf-8') as outfile:
-        outfile.write(json_object)
-        outfile.close()
+        json.dump(data_solution, outfile, ensure_ascii=False, indent=4)
 
     return optimal_solution
 
@@ -22,7 +22,7 @@ from Goddard.GoddardPrimalDualOCPAD import GoddardPrimalDual
 from timeit import default_timer as dtime
 from utils_functions import plot_sequence
 import matplotlib.pyplot as plt
-import pickle
+import numpy as np
 from bvpdae_solver import BVPDAE, BVPSol
 import json                               # for saving computations
 
@@ -70,9 +70,10 @@ def main_primal_dual():
         iter += 1
         print(" ")
     optimal_solution = dict(time=time, xp=xp, z=z, eps=eps / alpha, alpha=alpha, exec_time=cumul_time, iter=iter)
-    dict_save = dict(initial_solution=initial_solution, optimal_solution=optimal_solution)
-    with open("Goddard/results_goddard_primal_dual.pickle", "wb") as fh:
-        pickle.dump(dict_save, fh)
+    np.savez_compressed(
+        "Goddard/results_goddard_primal_dual.npz",
+        **optimal_solution, **{"initial_" + key: value for key, value in initial_solution.items()}
+    )
     plot_sequence(times, mus, "$\mu(t)$",
                   "Sequence of optimal penalized state-constraint multiplier $\\bar{\lambda}_\epsilon^g$")
     plot_sequence(times, nups, "$\eta_1(t)$",
@@ -96,12 +97,10 @@ def main_primal_dual():
     print("Number of iterations = ", len(times))
     print("Number of final time steps = ", len(time))
 
-    # save json file
+    # save json file, read by the julia notebook
     data_solution = {'t':time.tolist(), 'xp':xp.tolist(), 'z':z.tolist()}
-    json_object = json.dumps(data_solution, ensure_ascii=False, indent=4)
     with open("Goddard/results_goddard_primal_dual.json", 'w', encoding='utf-8') as outfile:
-        outfile.write(json_object)
-        outfile.close()
+        json.dump(data_solution, outfile, ensure_ascii=False, indent=4)
 
     return optimal_solution
 
@@ -74,6 +74,16 @@ def log_pen(x, d=0):
     raise Exception("logarithmic penalty is only defined for d in {0, 1, 2}")
 
 
+def log_pen_both(x):
+    """
+    First and second order derivatives of the logarithmic penalty, computed from a single inversion of x.
+    :param x: value or numpy array at which the penalty is evaluated
+    :return: tuple (log_pen(x, d=1), log_pen(x, d=2))
+    """
+    inv = 1. / x
+    return - inv, inv * inv
+
+
 def plot_sequence(times, seq, name, title, nplots=1):
     nsteps = len(seq) // nplots
     plt.figure()